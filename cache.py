@@ -1,7 +1,10 @@
 import logging
-from inspect import getargspec, getcallargs, isfunction
+import sys
+from functools import lru_cache, partial, wraps
+from inspect import Parameter, isfunction, ismethod, signature
+from types import SimpleNamespace
 
-from decorator import decorator
+from .simplecache import Cache, has_prefix
 
 try:
     from django.conf import settings
@@ -9,21 +12,26 @@ try:
     TTL = getattr(settings, 'CACHE_DEFAULT_TTL', 900)
     LOGGER_PREFIX = getattr(settings, 'LOGGER_PREFIX', '')
     DEBUG_LOG = __name__ in getattr(settings, 'DEBUG_LOG', '')
+    STRING_KEYS = True
 except ImportError:
-    from .simplecache import Cache
     CACHE = Cache()
     TTL = 0  # TTL is ignored in the simplecache
     LOGGER_PREFIX = ''
     DEBUG_LOG = False
+    STRING_KEYS = False
 
 logger = logging.getLogger(LOGGER_PREFIX + __name__)
 
-if DEBUG_LOG:
-    def log(*args, **kwargs):
-        logger.debug(*args, **kwargs)
-else:
-    def log(*args, **kwargs):
-        pass
+# A cache miss sentinel, as cached values may be any value except `_marker`
+_MISS = object()
+
+# The `log` calls are guarded with `if DEBUG_LOG` so that none of the
+# logging arguments are even packed up unless debug logging is enabled
+log = logger.debug
+
+
+# The computed prefixes by (module, class name, function name), see `prefix`
+_prefix_cache = {}
 
 
 def prefix(func):
@@ -39,13 +47,23 @@ def prefix(func):
     if cached_prefix:
         return cached_prefix
 
+    # Bound methods don't accept the `_prefix` attribute, so also remember
+    # the prefixes by the parts they are built from
+    _module = func.__module__ or ''
     _classname = classname(func)
+    cache_key = (_module, _classname, func.__name__)
+    cached_prefix = _prefix_cache.get(cache_key)
+    if cached_prefix:
+        return cached_prefix
+
     if _classname:
         _classname = '.' + _classname
 
-    _module = func.__module__ or ''
-
-    return _module + _classname + ':' + func.__name__ + ':'
+    # interned, so prefix comparisons in `has_prefix` are mostly pointer checks
+    cached_prefix = sys.intern(
+        _module + _classname + ':' + func.__name__ + ':')
+    _prefix_cache[cache_key] = cached_prefix
+    return cached_prefix
 
 
 def classname(func):
@@ -56,34 +74,166 @@ def classname(func):
     """
     if isfunction(func):
         return ''
+    _self = getattr(func, '__self__', None)
+    if _self is not None:
+        return getattr(_self, '__name__', type(_self).__name__)
+    return ''
+
+
+_POSITIONAL = (Parameter.POSITIONAL_ONLY, Parameter.POSITIONAL_OR_KEYWORD)
+_KEYWORD = (Parameter.KEYWORD_ONLY, Parameter.VAR_KEYWORD)
+
+
+def _signature(func):
+    """
+    Return the `inspect.signature` of a function. The decorators stamp it
+    onto the function (see `_ensure_meta`) as it is relatively slow to
+    compute. Bound methods are excluded, as they would pick up the signature
+    of the underlying function (including `self`).
+    """
+    sig = getattr(func, '_signature', None)
+    if sig is None or ismethod(func):
+        return signature(func)
+    return sig
+
+
+def callargs(func, *args, **kwargs):
+    """
+    A cachekey helper function. Return a dict of the argument names and
+    values for a function call, including any default values. This replaces
+    the deprecated `inspect.getcallargs`.
+    """
+    bound = _signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound.arguments
+
+
+def argspec(func):
+    """
+    A cachekey helper function. Return the positional argument names of a
+    function, a dict of their default values, a dict mapping each name to
+    its position so that `arguments` can merge call arguments without
+    binding them to the function signature, and whether the function takes
+    keyword-only arguments or `**kwargs`.
+    """
+    parameters = _signature(func).parameters.values()
+    params = [p for p in parameters if p.kind in _POSITIONAL]
+    arglist = [p.name for p in params]
+    defaults = dict((p.name, p.default) for p in params
+                    if p.default is not p.empty)
+    arg_index = dict((name, index) for index, name in enumerate(arglist))
+    keywords = any(p.kind in _KEYWORD for p in parameters)
+    return arglist, defaults, arg_index, keywords
+
+
+def _ensure_meta(func):
+    """
+    Stamp the signature, argument layout and prefix used by the cachekey
+    functions onto `func`, unless a decorator has already done so. The
+    decorators call this once at decoration time so the cachekey functions
+    can read the attributes directly; it only runs again for undecorated
+    functions passed to the cachekey helpers from outside a decorator.
+
+    Callables which don't accept new attributes (e.g. bound methods) are
+    left alone and the computed values are returned on a separate namespace
+    object instead.
+    """
     try:
-        return getattr(func.__self__, '__name__', func.im_class.__name__)
+        if not hasattr(func, '_signature'):
+            func._signature = signature(func)
+        if not hasattr(func, '_arglist'):
+            (func._arglist, func._defaults, func._arg_index,
+             func._keywords) = argspec(func)
+        if not hasattr(func, '_prefix'):
+            func._prefix = prefix(func)
+        return func
     except AttributeError:
-        return ''
+        meta = SimpleNamespace(_prefix=prefix(func))
+        (meta._arglist, meta._defaults, meta._arg_index,
+         meta._keywords) = argspec(func)
+        return meta
 
 
 def arguments(func, *args, **kwargs):
     """
     A cachekey helper function. Collect the arguments passed into a function
-    and return as a single list.
+    and return as a single tuple.
+
+    Keyword arguments are merged into the list in argument order, along with
+    any default values for the missing arguments.
+
+    Keyword-only arguments and `**kwargs` don't have a position, so for
+    functions which take them the tuple ends with a tuple of their sorted
+    `(name, value)` pairs.
 
-    The `decorator` function already merges all keyword arguments into `args`
-    (including any default values) so `kwargs` is primarily retained to ease
-    calls from outside the decorated function.
+    The argument layout is precomputed by the decorators (see `argspec`) so
+    `callargs` is only used as a last resort, e.g. for unexpected keyword
+    arguments or missing required arguments.
     """
-    arglist = getattr(func, '_arglist', False)
-    if not arglist:
-        arglist = getargspec(func).args
-    if len(args) == len(arglist):
-        return list(args)
-    callargs = getcallargs(func, *args, **kwargs)
-    return [callargs.get(arg) for arg in arglist]
+    try:
+        arglist = func._arglist
+        defaults = func._defaults
+        arg_index = func._arg_index
+        keywords = func._keywords
+    except AttributeError:
+        meta = _ensure_meta(func)
+        arglist = meta._arglist
+        defaults = meta._defaults
+        arg_index = meta._arg_index
+        keywords = meta._keywords
+    if keywords:
+        return _keyword_arguments(func, *args, **kwargs)
+    nargs = len(args)
+    try:
+        if not kwargs:
+            if nargs >= len(arglist):
+                return args
+            return args + tuple([defaults[name] for name in arglist[nargs:]])
+        for name in kwargs:
+            if arg_index[name] < nargs:
+                raise KeyError(name)
+        return args + tuple([
+            kwargs[name] if name in kwargs else defaults[name]
+            for name in arglist[nargs:]])
+    except KeyError:
+        _callargs = callargs(func, *args, **kwargs)
+        return tuple([_callargs.get(arg) for arg in arglist])
+
+
+def _keyword_arguments(func, *args, **kwargs):
+    """
+    The `arguments` implementation for functions which take keyword-only
+    arguments or `**kwargs`.
+    """
+    _callargs = callargs(func, *args, **kwargs)
+    positional = []
+    keywords = []
+    for param in _signature(func).parameters.values():
+        value = _callargs[param.name]
+        if param.kind in _POSITIONAL:
+            positional.append(value)
+        elif param.kind is Parameter.VAR_POSITIONAL:
+            positional.extend(value)
+        elif param.kind is Parameter.KEYWORD_ONLY:
+            keywords.append((param.name, value))
+        else:
+            keywords.extend(value.items())
+    return tuple(positional) + (tuple(sorted(keywords)),)
 
 
 def cachekey(func, *args, **kwargs):
     """
     Return a cache key which is unique for a function call, including arguments.
 
+    The key is a `(prefix, arguments)` tuple which is cheap to build and hash
+    for the in-process caches. See `cachekey_str` for backends which require
+    string keys.
+
+    As with `functools.lru_cache`, arguments which compare equal share a cache
+    key, e.g. `f(1)`, `f(1.0)` and `f(True)`. If the function was decorated
+    with `typed=True`, the key also includes the argument types, as a
+    `(prefix, arguments, types)` tuple, so those calls are cached separately.
+
     The default cachekey implementation just ignores the instance argument.
     Alternative cachekey implementations may use the instance to add
     additional instance variable values to the key.
@@ -93,9 +243,26 @@ def cachekey(func, *args, **kwargs):
     # ignoring `instance`
     instance_index = getattr(func, '_instance_index', False)
     if instance_index is not False:
-        args2.pop(instance_index)
+        args2 = args2[:instance_index] + args2[instance_index + 1:]
+
+    try:
+        _prefix = func._prefix
+    except AttributeError:
+        _prefix = _ensure_meta(func)._prefix
+    if getattr(func, '_typed', False):
+        return (_prefix, args2, tuple([type(arg) for arg in args2]))
+    return (_prefix, args2)
 
-    return prefix(func) + str(args2)
+
+def cachekey_str(func, *args, **kwargs):
+    """
+    Return the `cachekey` serialized into a string, for cache backends which
+    require string keys (e.g. the Django cache backends and their
+    `delete_pattern` method). The `repr` of the arguments already tells
+    apart equal values of different types, e.g. `1`, `1.0` and `True`.
+    """
+    key = cachekey(func, *args, **kwargs)
+    return key[0] + repr(key[1])
 
 
 def cachekey_static(func, *args, **kwargs):
@@ -103,32 +270,119 @@ def cachekey_static(func, *args, **kwargs):
     Return a cache key which is unique for a function, not including arguments.
 
     Optionally, add a `cachekey` keyword argument to function to create multiple
-    cache buckets for the same function.
+    cache buckets for the same function. The `cachekey` value is only picked
+    up when passed in as a keyword argument.
     """
-    return prefix(func) + kwargs.get('cachekey', '')
+    try:
+        return func._prefix + kwargs.get('cachekey', '')
+    except AttributeError:
+        return _ensure_meta(func)._prefix + kwargs.get('cachekey', '')
 
 
 def cachekey_request_user_ip(func, *args, **kwargs):
     """
     Return a cache key containing the user id and remote IP address from
-    the current `request`.
+    the current `request`, as a `(prefix, user_id, ip_address)` tuple, or
+    serialized into a string (like `cachekey_str`) when the Django cache
+    backends are in use.
 
     The fastest response assumes the request object is the first argument
     in the function call. If that assumption fails, we fall back on searching
-    for `request` with `inspect.getcallargs`. Either way the calculation
+    for `request` with `callargs`. Either way the calculation
     is still very fast but a quick benchmark suggests that the fast response
     can be about 16 times quicker.
     """
     try:
-        args2 = (args[0].user.id, args[0].META['REMOTE_ADDR'])
+        request = args[0]
+        _prefix = func._prefix
+        user_id, ip = request.user.id, request.META['REMOTE_ADDR']
     except AttributeError:
-        callargs = getcallargs(func, *args, **kwargs)
-        request = callargs.get('request', args[0])
-        args2 = (request.user.id, request.META['REMOTE_ADDR'])
-    return prefix(func) + str(args2)
+        request = callargs(func, *args, **kwargs).get('request') or args[0]
+        _prefix = _ensure_meta(func)._prefix
+        user_id, ip = request.user.id, request.META['REMOTE_ADDR']
+    if STRING_KEYS:
+        return _prefix + repr((user_id, ip))
+    return (_prefix, user_id, ip)
+
+
+_CACHEKEY_SOURCE = """\
+def _cachekey_(%(params)s):
+    return %(key)s
+"""
 
 
-def cache(seconds=TTL, _cache=CACHE, _key=cachekey, _marker=None):
+def compile_cachekey(func, skip=None, serialize=False, typed=False):
+    """
+    Return a key function for `func` which is equivalent to `cachekey` (or to
+    `cachekey_str` if `serialize` is True, including the argument types in
+    the tuple key if `typed` is True) but generated with the function's
+    own argument list, and called with just the function arguments. Python's
+    call machinery then takes care of merging the keyword arguments and
+    defaults, so no helper function calls or attribute lookups are needed to
+    compute each key. The argument at position `skip` (e.g. the
+    `cache_in_instance` instance) is left out of the key.
+
+    The key function is named after `func`, so a bad call raises the same
+    `TypeError` as calling `func` itself would.
+
+    Return None if the argument list can't be specialized this way, i.e.
+    when there are `*args`, `**kwargs`, positional-only or keyword-only
+    arguments.
+    """
+    meta = _ensure_meta(func)
+    arglist = meta._arglist
+    reserved = set(['_prefix_', '_defaults_', '_repr_', '_type_'])
+    if (any(p.kind is not p.POSITIONAL_OR_KEYWORD
+            for p in _signature(func).parameters.values()) or
+            reserved.intersection(arglist) or
+            (skip is not None and skip >= len(arglist))):
+        return None
+
+    defaults = meta._defaults
+    params = ', '.join(
+        '%s=_defaults_[%r]' % (name, name) if name in defaults else name
+        for name in arglist)
+    names = [name for index, name in enumerate(arglist) if index != skip]
+    args2 = '(%s)' % ''.join(name + ', ' for name in names)
+    if serialize:
+        key = '_prefix_ + _repr_(%s)' % args2
+    elif typed:
+        types = '(%s)' % ''.join('_type_(%s), ' % name for name in names)
+        key = '(_prefix_, %s, %s)' % (args2, types)
+    else:
+        key = '(_prefix_, %s)' % args2
+
+    namespace = {
+        '_prefix_': meta._prefix, '_defaults_': defaults,
+        '_repr_': repr, '_type_': type}
+    source = _CACHEKEY_SOURCE % {'params': params, 'key': key}
+    code = compile(source, '<cachekey %s>' % meta._prefix, 'exec')
+    exec(code, namespace)
+    key_func = namespace['_cachekey_']
+    key_func.__name__ = func.__name__
+    key_func.__qualname__ = getattr(func, '__qualname__', func.__name__)
+    return key_func
+
+
+def merged_cachekey(_key, func):
+    """
+    Return a key function for `func`, called with just the function arguments
+    (like the `compile_cachekey` key functions), which calls the custom
+    cachekey function `_key` with all the arguments merged into `args`
+    (including any default values), regardless of how the decorated function
+    was called.
+    """
+    def key_func(*args, **kwargs):
+        return _key(func, *arguments(func, *args, **kwargs))
+    return key_func
+
+
+# The Django cache backends expect string keys
+default_cachekey = cachekey_str if STRING_KEYS else cachekey
+
+
+def cache(seconds=TTL, _cache=CACHE, _key=default_cachekey, _marker=None,
+          typed=False):
     """
     Function decorator to cache the result in a cache (by default, the Django
     default cache) for the given number of seconds.
@@ -136,6 +390,11 @@ def cache(seconds=TTL, _cache=CACHE, _key=cachekey, _marker=None):
     The function result should only depend on its parameters and all
     parameters should be hashable (at least for the default key function).
 
+    As with `functools.lru_cache`, arguments which compare equal share a
+    cache entry by default, e.g. `f(1)`, `f(1.0)` and `f(True)`. Set `typed`
+    to cache arguments of different types separately. (The string keys used
+    with the Django cache always tell those apart.)
+
     To signal a non-cacheable result, either the cachekey function or the
     decorated function can return a do-not-cache `_marker`.
 
@@ -153,49 +412,193 @@ def cache(seconds=TTL, _cache=CACHE, _key=cachekey, _marker=None):
     deletes into batches. See `clear_prefix` implementation for an example.
 
     The cache backend interface is also directly accessible via `func.cache`.
+    Note that with the simplecache backend, the result of a function without
+    arguments is kept in the decorated function rather than in `func.cache`.
     """
     def _decorator(func):
-        func._arglist = getargspec(func).args
-        func._prefix = prefix(func)
+        _ensure_meta(func)
+        func._typed = typed
+
+        # specialize the default cachekeys for this function's arguments,
+        # all the key functions are called with just the function arguments
+        key_func = None
+        if _key is cachekey or _key is cachekey_str:
+            key_func = compile_cachekey(
+                func, serialize=_key is cachekey_str, typed=typed)
+        compiled = key_func is not None
+        if not compiled:
+            if _key in (cachekey, cachekey_str, cachekey_static):
+                key_func = partial(_key, func)
+            else:
+                key_func = merged_cachekey(_key, func)
+
+        # A function without arguments (and a compiled default cachekey) only
+        # ever has a single cache entry. For the in-process simplecache, which
+        # ignores expiry anyway, just keep that result in the wrapper closure.
+        # Subclasses may add expiry, so they go through the backend as usual.
+        if not func._arglist and compiled and type(_cache) is Cache:
+            return _cache_once(func, _cache, _marker)
+
+        # Bind the simplecache methods once rather than looking them up per
+        # call. Other backends may be proxies (e.g. Django's default `cache`
+        # hands each thread its own backend) so they're looked up every time.
+        if isinstance(_cache, Cache):
+            _get = _cache.get
+            _set = _cache.set
+            _delete = _cache.delete
+        else:
+            def _get(key, default):
+                return _cache.get(key, default)
+
+            def _set(key, value, timeout):
+                _cache.set(key, value, timeout)
+
+            def _delete(key):
+                _cache.delete(key)
 
         def cache_delete(*args, **kwargs):
-            key = _key(func, *args, **kwargs)
-            log('cleared cache value for %s key', key)
-            _cache.delete(key)
-
-        def cache_clear():
-            if hasattr(_cache, 'delete_pattern'):
-                _cache.delete_pattern(func._prefix + '*')
-            elif hasattr(_cache, 'clear_prefix'):
-                _cache.clear_prefix(func._prefix)
-
-        def wrapper(func, *args, **kwargs):
-            key = _key(func, *args, **kwargs)
+            key = key_func(*args, **kwargs)
+            if DEBUG_LOG:
+                log('cleared cache value for %s key', key)
+            _delete(key)
+
+        # pick the backend clear method once, at decoration time
+        if hasattr(_cache, 'delete_pattern'):
+            pattern = func._prefix + '*'
+
+            def cache_clear():
+                _cache.delete_pattern(pattern)
+        elif hasattr(_cache, 'clear_prefix'):
+            key_prefix = func._prefix
+
+            def cache_clear():
+                _cache.clear_prefix(key_prefix)
+        else:
+            def cache_clear():
+                pass
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_func(*args, **kwargs)
             if key is _marker:
-                log('skipped cache check for %s key', key)
+                if DEBUG_LOG:
+                    log('skipped cache check for %s key', key)
                 return func(*args, **kwargs)
-            result = _cache.get(key, _marker)
+            result = _get(key, _marker)
             if result is _marker:
-                log('calculated a new value for %s key', key)
+                if DEBUG_LOG:
+                    log('calculated a new value for %s key', key)
                 result = func(*args, **kwargs)
                 if result is not _marker:
-                    _cache.set(key, result, seconds)
-            else:
+                    _set(key, result, seconds)
+            elif DEBUG_LOG:
                 log('obtained the cached value for %s key', key)
             return result
 
-        newfunc = decorator(wrapper, func)
-        newfunc.cache = _cache
-        newfunc.cache_delete = cache_delete
-        newfunc.cache_clear = cache_clear
-        newfunc._arglist = func._arglist
-        newfunc._prefix = func._prefix
-        return newfunc
+        # `wraps` also copies the `_arglist`, `_prefix`, etc. attributes
+        wrapper.cache = _cache
+        wrapper.cache_delete = cache_delete
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return _decorator
+
+
+def _cache_once(func, _cache, _marker):
+    """
+    Return a `cache` wrapper for a function without arguments which keeps
+    its single result in a closure instead of in the `_cache` backend.
+    """
+    result = _MISS
+
+    def cache_delete(*args, **kwargs):
+        nonlocal result
+        if DEBUG_LOG:
+            log('cleared cache value for %s', func._prefix)
+        result = _MISS
+
+    @wraps(func)
+    def wrapper():
+        nonlocal result
+        if result is not _MISS:
+            if DEBUG_LOG:
+                log('obtained the cached value for %s', func._prefix)
+            return result
+        if DEBUG_LOG:
+            log('calculated a new value for %s', func._prefix)
+        value = func()
+        if value is not _marker:
+            result = value
+        return value
+
+    wrapper.cache = _cache
+    wrapper.cache_delete = cache_delete
+    wrapper.cache_clear = cache_delete
+    return wrapper
+
+
+def cache_static(seconds=TTL, _cache=CACHE):
+    """
+    Function decorator to cache a result which doesn't depend on the function
+    arguments, keyed with `cachekey_static`. Unlike `cache`, every result is
+    cached, including None. See `cache` for usage.
+
+    For the in-process simplecache (which ignores expiry anyway), functions
+    without arguments, other than an optional `cachekey` argument, are
+    memoized with `functools.lru_cache` instead, which runs entirely in C.
+    In that case `func.cache_delete` and `func.cache_clear` both clear all the
+    cached values and `func.cache_info` reports the `lru_cache` statistics.
+    """
+    def _decorator(func):
+        parameters = _signature(func).parameters
+        static = all(
+            p.name == 'cachekey' and
+            p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)
+            for p in parameters.values())
+
+        # subclasses may add expiry, so they go through `cache` as usual
+        if not (static and type(_cache) is Cache):
+            return cache(seconds, _cache, cachekey_static, object())(func)
+
+        memo = lru_cache(maxsize=None)(func)
+        if not parameters:
+            cached = memo
+        else:
+            # `lru_cache` keys on the call form, so always pass `cachekey`
+            # by keyword, defaulting to '' like `cachekey_static`
+            param = parameters['cachekey']
+            default = '' if param.default is param.empty else param.default
+            if param.kind is param.KEYWORD_ONLY:
+                def cached(*, cachekey=default):
+                    return memo(cachekey=cachekey)
+            else:
+                def cached(cachekey=default):
+                    return memo(cachekey=cachekey)
+            cached = wraps(func)(cached)
+            cached.cache_info = memo.cache_info
+            cached.cache_clear = memo.cache_clear
+        cached.cache = _cache
+        cached.cache_delete = lambda *args, **kwargs: memo.cache_clear()
+        return cached
 
     return _decorator
 
 
-def cache_in_instance(_instance='instance', _key=cachekey, _marker=None):
+def _get_instance_cache(instance):
+    """
+    Return the cache dictionary of an instance (or request), creating it on
+    first use. Used by `cache_in_instance` and `request_cache`.
+    """
+    assert instance is not None, 'calls without an instance are not cached'
+    try:
+        cache = instance._instance_cache
+    except AttributeError:
+        cache = instance._instance_cache = {}
+    return cache
+
+
+def cache_in_instance(_instance='instance', _key=cachekey, _marker=None,
+                      typed=False):
     """
     Instance method memoize decorator to cache the result during the lifetime
     of the current class instance. This gives us a more generalized version
@@ -211,7 +614,8 @@ def cache_in_instance(_instance='instance', _key=cachekey, _marker=None):
     should be hashable (at least for the default key function). If there
     are instance variables that should be included in the cache key, then
     those variables should be added to the function argument list or added
-    to a custom `_key` function.
+    to a custom `_key` function. Arguments which compare equal share a cache
+    entry unless `typed` is set (see `cache`).
 
     To signal a non-cacheable result, either the cachekey function or the
     decorated method or function can return a do-not-cache `_marker`.
@@ -251,71 +655,117 @@ def cache_in_instance(_instance='instance', _key=cachekey, _marker=None):
             my_function.cache_clear(instance)
 
     """
-    def get_instance_cache(instance):
-        if instance is None:
-            return {}
-        if not hasattr(instance, '_instance_cache'):
-            instance._instance_cache = {}
-        return instance._instance_cache
-
     def _decorator(func):
 
-        # `decorator` function merges all keyword arguments into 'args'
-        # list so `instance` value may be anywhere in the list
-        arglist = getargspec(func).args
+        # `instance` may be passed in as a positional or keyword argument,
+        # but it needs a position to be dropped from the key
+        arglist = _ensure_meta(func)._arglist
+        if _instance in func._signature.parameters:
+            if _instance not in arglist:
+                raise TypeError('%s() has a keyword-only %r argument'
+                                % (func.__name__, _instance))
         instance_index = 0
         if _instance in arglist:
             instance_index = arglist.index(_instance)
+        instance_default = func._defaults.get(_instance)
 
         func._instance_index = instance_index
         func._instance_name = _instance
-        func._arglist = arglist
-        func._prefix = prefix(func)
+        func._typed = typed
+
+        # specialize the default cachekey for this function's arguments,
+        # all the key functions are called with just the function arguments
+        key_func = None
+        if _key is cachekey:
+            key_func = compile_cachekey(
+                func, skip=instance_index, typed=typed)
+        compiled = key_func is not None
+        if not compiled:
+            if _key is cachekey:
+                key_func = partial(_key, func)
+            else:
+                key_func = merged_cachekey(_key, func)
+
+        # if `instance` is the only argument there's just one cache entry
+        # per instance, so its key only needs to be computed once (calls with
+        # other arguments still go through `key_func`, which rejects them)
+        fixed_key = None
+        if compiled and len(arglist) == 1:
+            fixed_key = key_func(None)
 
         def cache_delete(instance, *args, **kwargs):
-            cache = get_instance_cache(instance)
-            args = [instance] + list(args)
-            key = _key(func, *args, **kwargs)
-            log('cleared cache value for %s key', key)
+            if instance is None:
+                return
+            cache = _get_instance_cache(instance)
+            if _instance in func._arg_index and instance_index >= len(args):
+                # a keyword `instance` may follow keyword arguments
+                kwargs[_instance] = instance
+            else:
+                args = list(args)
+                args.insert(instance_index, instance)
+            key = key_func(*args, **kwargs)
+            if DEBUG_LOG:
+                log('cleared cache value for %s key', key)
             cache.pop(key, None)
 
         def cache_clear(instance):
-            cache = get_instance_cache(instance)
-            key_prefix = prefix(func)
-            keys = [k for k in cache.keys() if k.startswith(key_prefix)]
-            for key in keys:
-                log('cleared cache value for %s key', key)
-                cache.pop(key, None)
-
-        def wrapper(func, *args, **kwargs):
-            cache = get_instance_cache(args[instance_index])
-            key = _key(func, *args, **kwargs)
+            if instance is None:
+                return
+            cache = _get_instance_cache(instance)
+            key_prefix = func._prefix
+            for key in [k for k in cache if has_prefix(k, key_prefix)]:
+                if DEBUG_LOG:
+                    log('cleared cache value for %s key', key)
+                del cache[key]
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # The instance lookup, `_get_instance_cache` and (for a fixed key)
+            # `key_func` calls are inlined here, as the interpreter overhead
+            # of those function calls is most of the cost of a cache hit
+            if instance_index < len(args):
+                instance = args[instance_index]
+            else:
+                instance = kwargs.get(_instance, instance_default)
+            if instance is None:
+                if DEBUG_LOG:
+                    log('skipped cache check without an instance')
+                return func(*args, **kwargs)
+            # inlined `_get_instance_cache(instance)`, keep the two in sync
+            try:
+                cache = instance._instance_cache
+            except AttributeError:
+                cache = instance._instance_cache = {}
+            if fixed_key is not None and len(args) + len(kwargs) == 1:
+                key = fixed_key
+            else:
+                key = key_func(*args, **kwargs)
             if key is _marker:
-                log('skipped cache check for %s key', key)
+                if DEBUG_LOG:
+                    log('skipped cache check for %s key', key)
                 return func(*args, **kwargs)
-            if key in cache:
-                log('obtained the cached value for %s key', key)
-                return cache[key]
-            log('calculated a new value for %s key', key)
+            result = cache.get(key, _MISS)
+            if result is not _MISS:
+                if DEBUG_LOG:
+                    log('obtained the cached value for %s key', key)
+                return result
+            if DEBUG_LOG:
+                log('calculated a new value for %s key', key)
             result = func(*args, **kwargs)
             if result is not _marker:
                 cache[key] = result
             return result
 
-        newfunc = decorator(wrapper, func)
-        newfunc.cache = lambda i: get_instance_cache(i)
-        newfunc.cache_delete = cache_delete
-        newfunc.cache_clear = cache_clear
-        newfunc._instance_index = instance_index
-        newfunc._instance_name = _instance
-        newfunc._arglist = func._arglist
-        newfunc._prefix = func._prefix
-        return newfunc
+        # `wraps` also copies the `_arglist`, `_prefix`, etc. attributes
+        wrapper.cache = lambda i: {} if i is None else _get_instance_cache(i)
+        wrapper.cache_delete = cache_delete
+        wrapper.cache_clear = cache_clear
+        return wrapper
 
     return _decorator
 
 
-def cache_in_request(_key=cachekey, _marker=None):
+def cache_in_request(_key=cachekey, _marker=None, typed=False):
     """
     Convenience wrapper around `cache_in_instance` to cache result of
     decorated function into the current request. The request instance
@@ -324,7 +774,8 @@ def cache_in_request(_key=cachekey, _marker=None):
 
     See `cache_in_instance` for usage.
     """
-    return cache_in_instance(_instance='request', _key=_key, _marker=_marker)
+    return cache_in_instance(
+        _instance='request', _key=_key, _marker=_marker, typed=typed)
 
 
 def request_cache(request, key, value=None):
@@ -333,9 +784,7 @@ def request_cache(request, key, value=None):
     `cache_in_request` decorator. Pass in `value` to set a cached
     value for the given key during the lifetime of the request.
     """
-    if not hasattr(request, '_instance_cache'):
-        request._instance_cache = {}
-    cache = request._instance_cache
+    cache = _get_instance_cache(request)
     key = 'ncc.cache:request_cache:' + key
     if value is not None:
         cache[key] = value
@@ -1,3 +1,13 @@
+def has_prefix(key, prefix):
+    """
+    Return True if a cache key belongs to the function with the given
+    `prefix`. Keys are either `(prefix, arguments)` tuples (see
+    `cache.cachekey`) or plain strings starting with the prefix; any other
+    key never matches.
+    """
+    if isinstance(key, tuple):
+        return bool(key) and key[0] == prefix
+    return isinstance(key, str) and key.startswith(prefix)
 
 
 class Cache(object):
@@ -10,6 +20,9 @@ class Cache(object):
     usually what we want). If the `clear_prefix` method is missing, the
     decorator function `func.cache_clear()` will just be a no-op.
 
+    Keys are stored as `(key_prefix, version, key)` tuples, so the decorator
+    can pass in `cachekey` tuples as-is without serializing them first.
+
     Note that cache expiry is not implemented in this class. Any expiry
     value passed in will be ignored. So this is mostly for very transient
     caches as otherwise we risk blowing up the memory requirements.
@@ -19,33 +32,40 @@ class Cache(object):
     converting this is not high-priority.
     """
 
+    __slots__ = ('_cache', 'version', 'key_prefix')
+
     def __init__(self, version=1, key_prefix=''):
         self._cache = {}
         self.version = version
         self.key_prefix = key_prefix
 
     def make_key(self, key, version=None):
-        version = version or self.version
-        return '%s:%s:%s' % (self.key_prefix, version, key)
+        return (self.key_prefix, version or self.version, key)
+
+    # The key tuples are built inline rather than with `make_key` as these
+    # are called for every decorated function call
 
     def get(self, key, default=None):
-        return self._cache.get(self.make_key(key), default)
+        return self._cache.get((self.key_prefix, self.version, key), default)
 
     def set(self, key, value, seconds):
-        self._cache[self.make_key(key)] = value
+        self._cache[(self.key_prefix, self.version, key)] = value
 
     def delete(self, key):
-        _key = self.make_key(key)
-        if _key in self._cache:
-            del self._cache[_key]
+        self._cache.pop((self.key_prefix, self.version, key), None)
 
     def delete_many(self, *keys):
         for key in keys:
             self.delete(key)
 
     def clear_prefix(self, prefix):
-        if prefix:
-            prefix = self.make_key(prefix)
-            for key in self._cache.keys():
-                if key.startswith(prefix):
-                    del self._cache[key]
+        if prefix and self._cache:
+            # collect the keys first, the dict can't change size while
+            # it's being iterated over
+            _cache = self._cache
+            keys = [
+                key for key in _cache
+                if key[0] == self.key_prefix and key[1] == self.version and
+                has_prefix(key[2], prefix)]
+            for key in keys:
+                del _cache[key]
@@ -1,5 +1,9 @@
+import gc
+import sys
 import unittest
+import weakref
 from datetime import datetime, timedelta
+from unittest import mock
 
 try:
     from django.http import HttpRequest
@@ -8,7 +12,8 @@ except ImportError:
         pass
     
 from .cache import (
-    cachekey, cache, cache_in_instance, cache_in_request,
+    cachekey, cachekey_str, cachekey_request_user_ip, compile_cachekey,
+    cache, cache_static, cache_in_instance, cache_in_request,
     request_cache, prefix, arguments)
 
 from .simplecache import Cache
@@ -64,15 +69,105 @@ class TestCacheHelpers(unittest.TestCase):
             prefix(A_Class.a_staticmethod),
             'lib.test_cache:a_staticmethod:')
 
+        # functions sharing a qualname but renamed get their own prefix
+        def make(name):
+            def f():
+                pass
+            f.__name__ = name
+            return f
+        self.assertEqual(prefix(make('alpha')), 'lib.test_cache:alpha:')
+        self.assertEqual(prefix(make('beta')), 'lib.test_cache:beta:')
+
     def test_arguments(self):
 
         # default values should also be returned
         self.assertEqual(
-            arguments(a_function, 1, 2, d=44), [1, 2, 3, 44])
+            arguments(a_function, 1, 2, d=44), (1, 2, 3, 44))
 
         # should be independent of caller argument order
         self.assertEqual(
-            arguments(a_function, 1, d=44, c=33, b=22), [1, 22, 33, 44])
+            arguments(a_function, 1, d=44, c=33, b=22), (1, 22, 33, 44))
+
+    def test_cachekey(self):
+
+        # default cachekey is a (prefix, arguments) tuple
+        self.assertEqual(
+            cachekey(a_function, 1, 2, d=44),
+            ('lib.test_cache:a_function:', (1, 2, 3, 44)))
+
+        # string version for backends requiring string keys
+        self.assertEqual(
+            cachekey_str(a_function, 1, 2, d=44),
+            'lib.test_cache:a_function:(1, 2, 3, 44)')
+
+    def test_cachekey_bound_method(self):
+
+        # bound methods can't be stamped but should still get a key
+        self.assertEqual(
+            cachekey(A_Class().a_method),
+            ('lib.test_cache.A_Class:a_method:', ()))
+
+    def test_cachekey_request_user_ip(self):
+
+        class User(object):
+            id = 7
+
+        def view(a, request=None):
+            pass
+
+        request = HttpRequest()
+        request.user = User()
+        request.META = {'REMOTE_ADDR': '127.0.0.1'}
+        expected = ('lib.test_cache:view:', 7, '127.0.0.1')
+
+        # request as the first argument
+        self.assertEqual(
+            cachekey_request_user_ip(view, request), expected)
+
+        # request as a keyword argument
+        self.assertEqual(
+            cachekey_request_user_ip(view, 1, request=request), expected)
+
+        # string keys for the Django cache backends
+        cache_module = sys.modules[cachekey_request_user_ip.__module__]
+        with mock.patch.object(cache_module, 'STRING_KEYS', True):
+            self.assertEqual(
+                cachekey_request_user_ip(view, request),
+                "lib.test_cache:view:(7, '127.0.0.1')")
+
+    def test_compile_cachekey(self):
+
+        # compiled cachekeys should match the generic cachekeys
+        key = compile_cachekey(a_function)
+        self.assertEqual(
+            key(1, d=44, c=33, b=22),
+            cachekey(a_function, 1, d=44, c=33, b=22))
+
+        key = compile_cachekey(a_function, serialize=True)
+        self.assertEqual(
+            key(1, 2, d=44),
+            cachekey_str(a_function, 1, 2, d=44))
+
+        # skipped arguments are left out of the key
+        key = compile_cachekey(a_function, skip=0)
+        self.assertEqual(
+            key(1, 2),
+            ('lib.test_cache:a_function:', (2, 3, 4)))
+
+        # bad calls should raise the same error as the function itself
+        with self.assertRaisesRegex(TypeError, r'^a_function\(\) takes'):
+            key(1, 2, 3, 4, 5)
+
+        # arguments may shadow the names used in the generated function
+        def shadowing_function(repr, prefix=''):
+            pass
+        key = compile_cachekey(shadowing_function, serialize=True)
+        self.assertEqual(key(1), 'lib.test_cache:shadowing_function:(1, \'\')')
+
+        # functions with variable arguments can't be specialized
+        def varargs_function(a, *args, **kwargs):
+            pass
+        self.assertIsNone(compile_cachekey(varargs_function))
 
 
 class TestCacheDecorator(unittest.TestCase):
@@ -93,6 +188,21 @@ class TestCacheDecorator(unittest.TestCase):
             return str(datetime.now())
         self.assertEqual(testfunc(), testfunc())
 
+        # deleting the cached result should force a new result
+        result = testfunc()
+        testfunc.cache_delete()
+        self.assertNotEqual(testfunc(), result)
+
+        # a Cache subclass should still be asked for the cached value
+        class ExpiringCache(Cache):
+            def get(self, key, default=None):
+                return default
+
+        @cache(_cache=ExpiringCache())
+        def testfunc():
+            return str(datetime.now())
+        self.assertNotEqual(testfunc(), testfunc())
+
     def test_cache_with_arguments(self):
 
         # test non-cached function for baseline behavior
@@ -109,6 +219,81 @@ class TestCacheDecorator(unittest.TestCase):
         # different arguments should result in different values
         self.assertNotEqual(testfunc(2, 1), testfunc(3, 1))
 
+    def test_cache_with_keyword_arguments(self):
+
+        @cache(_cache=Cache())
+        def testfunc(a, b=1):
+            return str(datetime.now() + timedelta(days=a + b))
+
+        # positional, keyword and default arguments should share a key
+        result = testfunc(1)
+        self.assertEqual(testfunc(1, 1), result)
+        self.assertEqual(testfunc(1, b=1), result)
+        self.assertEqual(testfunc(b=1, a=1), result)
+
+        # the decorated function should keep its name
+        self.assertEqual(testfunc.__name__, 'testfunc')
+
+    def test_cache_with_keyword_only_arguments(self):
+
+        @cache(_cache=Cache())
+        def testfunc(a, *, b=1, **kwargs):
+            return (a, b, kwargs)
+
+        # keyword-only and `**kwargs` values should be part of the key
+        self.assertEqual(testfunc(1, b=1), (1, 1, {}))
+        self.assertEqual(testfunc(1, b=2), (1, 2, {}))
+        self.assertEqual(testfunc(1, c=3), (1, 1, {'c': 3}))
+        self.assertEqual(testfunc(1, c=4), (1, 1, {'c': 4}))
+
+        # a default keyword-only value should share a key with an explicit one
+        self.assertEqual(testfunc(1), (1, 1, {}))
+        self.assertEqual(len(testfunc.cache._cache), 4)
+
+    def test_cache_typed(self):
+
+        @cache(_cache=Cache())
+        def testfunc(a):
+            return repr(a)
+
+        # equal arguments of different types share a cache entry
+        self.assertEqual(testfunc(1), '1')
+        self.assertEqual(testfunc(True), '1')
+        self.assertEqual(testfunc(1.0), '1')
+
+        @cache(_cache=Cache(), typed=True)
+        def testfunc(a):
+            return repr(a)
+
+        # unless `typed` is set
+        self.assertEqual(testfunc(1), '1')
+        self.assertEqual(testfunc(True), 'True')
+        self.assertEqual(testfunc(1.0), '1.0')
+
+        # the generic cachekey should agree with the compiled one
+        self.assertEqual(
+            cachekey(testfunc.__wrapped__, True),
+            ('lib.test_cache:testfunc:', (True,), (bool,)))
+
+    def test_cache_does_not_leak_functions(self):
+
+        class Captured(object):
+            pass
+
+        def factory():
+            captured = Captured()
+
+            @cache(_cache=Cache())
+            def testfunc(a):
+                return captured
+            testfunc(1)
+            return weakref.ref(captured)
+
+        # nothing global should keep the decorated function alive
+        ref = factory()
+        gc.collect()
+        self.assertIsNone(ref())
+
     def test_cache_delete(self):
 
         @cache(_cache=Cache())
@@ -160,6 +345,13 @@ class TestCacheDecorator(unittest.TestCase):
         testfunc2.cache_clear()
         self.assertEqual(len(_cache), 0)
 
+        # other (non-decorator) keys should be left alone
+        shared_cache.set(123, 'value', 0)
+        shared_cache.set((), 'value', 0)
+        testfunc1.cache_clear()
+        self.assertEqual(shared_cache.get(123), 'value')
+        self.assertEqual(shared_cache.get(()), 'value')
+
     def test_do_not_cache_marker(self):
 
         marker = object()
@@ -188,6 +380,85 @@ class TestCacheDecorator(unittest.TestCase):
         self.assertNotEqual(result, cached_result)
         self.assertEqual(testfunc(), cached_result)
 
+    def test_cache_proxy_backend(self):
+
+        # like Django's default `cache`, which has a backend per thread
+        class CacheProxy(object):
+            def __init__(self):
+                self.backend = Cache()
+
+            def __getattr__(self, name):
+                return getattr(self.backend, name)
+
+        proxy = CacheProxy()
+
+        @cache(_cache=proxy)
+        def testfunc(a):
+            return str(datetime.now())
+
+        # the backend should be looked up on every call
+        testfunc(1)
+        backend, proxy.backend = proxy.backend, Cache()
+        testfunc(1)
+        self.assertEqual(len(backend._cache), 1)
+        self.assertEqual(len(proxy.backend._cache), 1)
+
+
+class TestCacheStaticDecorator(unittest.TestCase):
+    """
+    Test `lib.cache.cache_static` decorator.
+    """
+
+    def test_cache_static_lru_cache(self):
+
+        _cache = Cache()
+
+        @cache_static(_cache=_cache)
+        def testfunc(cachekey=''):
+            return str(datetime.now())
+
+        # same interface as `cache`
+        self.assertIs(testfunc.cache, _cache)
+
+        # functions without arguments use `functools.lru_cache`
+        result1 = testfunc()
+        self.assertEqual(testfunc(), result1)
+        self.assertEqual(testfunc.cache_info().hits, 1)
+
+        # the same `cachekey` shares a cache entry, however it's passed
+        self.assertEqual(testfunc(cachekey=''), result1)
+        self.assertEqual(testfunc(''), result1)
+        self.assertEqual(testfunc.cache_info().currsize, 1)
+
+        # `cachekey` creates separate cache buckets
+        self.assertNotEqual(testfunc(cachekey='other'), result1)
+        self.assertEqual(testfunc('other'), testfunc(cachekey='other'))
+
+        # deleting or clearing removes all cache entries
+        testfunc.cache_delete()
+        self.assertEqual(testfunc.cache_info().currsize, 0)
+        self.assertNotEqual(testfunc(), result1)
+
+    def test_cache_static_ignores_arguments(self):
+
+        @cache_static(_cache=Cache())
+        def testfunc(a, cachekey=''):
+            return a, str(datetime.now())
+
+        # arguments other than `cachekey` don't change the result
+        result1 = testfunc(1)
+        self.assertEqual(testfunc(2), result1)
+        self.assertNotEqual(testfunc(1, cachekey='other'), result1)
+
+        # None results are cached too
+        @cache_static(_cache=Cache())
+        def testfunc(a):
+            testfunc.calls += 1
+        testfunc.calls = 0
+        testfunc(1)
+        testfunc(2)
+        self.assertEqual(testfunc.calls, 1)
+
 
 class TestCacheInInstanceDecorator(unittest.TestCase):
     """
@@ -256,6 +527,30 @@ class TestCacheInInstanceDecorator(unittest.TestCase):
         # there should now be three items in the cache
         self.assertEqual(len(testfunc.cache(instance)), 3)
 
+        # deleting with keyword arguments should force a new result
+        result1 = testfunc(1, b=2, instance=instance)
+        testfunc.cache_delete(instance, 1, b=2)
+        self.assertNotEqual(testfunc(1, 2, instance=instance), result1)
+
+        # a keyword-only instance can't be dropped from the key
+        with self.assertRaises(TypeError):
+            @cache_in_instance()
+            def testfunc(a, *, instance=None):
+                return instance.my_method(a, 1)
+
+    def test_cache_without_instance(self):
+
+        # calls without an instance should never be cached
+        @cache_in_instance()
+        def testfunc(a, b, instance=None):
+            return a, b, str(datetime.now())
+        self.assertNotEqual(testfunc(1, 2), testfunc(1, 2))
+        self.assertEqual(testfunc.cache(None), {})
+
+        # deleting or clearing without an instance should be a no-op
+        testfunc.cache_delete(None, 1, 2)
+        testfunc.cache_clear(None)
+
     def test_cache_method(self):
 
         # test non-cached method for baseline behavior
@@ -285,6 +580,43 @@ class TestCacheInInstanceDecorator(unittest.TestCase):
         # there should now be three items in the cache
         self.assertEqual(len(instance.my_method.cache(instance)), 3)
 
+    def test_cache_method_without_arguments(self):
+
+        class MyClass(object):
+            @cache_in_instance()
+            def my_method(self):
+                return str(datetime.now())
+        instance = MyClass()
+
+        result1 = instance.my_method()
+        self.assertEqual(instance.my_method(), result1)
+
+        # there is a single cache entry, without any arguments
+        self.assertEqual(
+            list(instance._instance_cache), [(MyClass.my_method._prefix, ())])
+
+        # unexpected arguments should still raise an error
+        with self.assertRaises(TypeError):
+            instance.my_method(5)
+
+        # deleting the cache entry should force a new result
+        MyClass.my_method.cache_delete(instance)
+        self.assertNotEqual(instance.my_method(), result1)
+
+    def test_cache_classmethod(self):
+
+        class MyClass(object):
+            @classmethod
+            @cache_in_instance()
+            def my_classmethod(cls, arg1):
+                return arg1, str(datetime.now())
+
+        # the cache is stored on the class itself
+        self.assertEqual(
+            MyClass.my_classmethod(1),
+            MyClass.my_classmethod(1))
+        self.assertEqual(len(MyClass._instance_cache), 1)
+
     def test_cache_method_delete(self):
 
         class MyClass(object):